@@ -1,14 +1,39 @@
-from langchain_anthropic import ChatAnthropic
 from typing import Dict, Any, List
 from datetime import datetime
+import hashlib
+import json
+from utils.llm_client import get_llm_factory
+from utils.rate_limiter import get_rate_limiter, estimate_tokens
+from utils.single_flight import get_single_flight
+
+# Output tokens budgeted per call before the actual usage is known
+EXPECTED_OUTPUT_TOKENS = 512
+
+def prompt_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """Stable hash identifying a prompt sent to a model"""
+    return hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode()).hexdigest()
 
 class BaseAgent:
-    def __init__(self, anthropic_api_key: str, model: str = "claude-3-5-sonnet-20240620"):
-        self.llm = ChatAnthropic(
-            anthropic_api_key=anthropic_api_key,
-            model=model
-        )
+    def __init__(self, anthropic_api_key: str, model: str = "claude-3-5-sonnet-20240620", llm_factory=None):
+        # Agents share one client and connection pool unless a factory is injected
+        factory = llm_factory or get_llm_factory(anthropic_api_key)
+        self.llm = factory.chat_model(model)
+        self.rate_limiter = get_rate_limiter()
+        self.prompt_flight = get_single_flight("prompts")
         self.conversation_history: List[Dict[str, Any]] = []
+    
+    def invoke_llm(self, messages: List[Dict[str, str]]):
+        """Call the LLM through the process-wide rate limiter.
+
+        Identical prompts already in flight are coalesced into one call.
+        """
+        estimated = sum(estimate_tokens(msg["content"]) for msg in messages) + EXPECTED_OUTPUT_TOKENS
+        key = prompt_key(getattr(self.llm, "model", ""), messages)
+        return self.prompt_flight.do(key, lambda: self.rate_limiter.call(
+            lambda: self.llm.invoke(messages),
+            estimated_tokens=estimated,
+            usage=lambda response: (getattr(response, "usage_metadata", None) or {}).get("total_tokens")
+        ))
         
     def add_to_history(self, role: str, content: str):
         """Add a message to conversation history"""
@@ -46,7 +71,7 @@ class BaseAgent:
         Explain your reasoning in a second line.
         """
         
-        response = self.llm.invoke([{"role": "user", "content": prompt}])
+        response = self.invoke_llm([{"role": "user", "content": prompt}])
         return response.content.lower().startswith('yes')
     
     def process(self, query: str) -> str:
@@ -2,8 +2,20 @@ from .base_agent import BaseAgent
 import psycopg2
 from typing import Dict, Any, List, Tuple
 import json
+import math
 from decimal import Decimal
 from schema.database_schema import LOCATIONS_SCHEMA, ACTIVITY_SCORES_SCHEMA, VALID_ACTIVITIES
+from utils.location_names import LocationIndex
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -12,8 +24,8 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 class DatabaseAgent(BaseAgent):
-    def __init__(self, anthropic_api_key: str, db_config: dict, model: str = "claude-3-5-sonnet-20240620"):
-        super().__init__(anthropic_api_key=anthropic_api_key, model=model)
+    def __init__(self, anthropic_api_key: str, db_config: dict, model: str = "claude-3-5-sonnet-20240620", llm_factory=None):
+        super().__init__(anthropic_api_key=anthropic_api_key, model=model, llm_factory=llm_factory)
         self.db_config = db_config
         self.schema = self._get_schema()
         
@@ -28,6 +40,28 @@ class DatabaseAgent(BaseAgent):
             cur.close()
             conn.close()
     
+    def find_nearby_locations(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[str, float]]:
+        """Get (name, distance in km) for locations within radius_km, nearest first"""
+        lat_delta = radius_km / 111.0  # ~111 km per degree of latitude
+        lon_delta = radius_km / max(111.0 * math.cos(math.radians(latitude)), 1e-6)
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            # Bounding box prefilter, exact distance below
+            cur.execute("""
+                SELECT name, latitude, longitude FROM locations
+                WHERE latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s
+            """, (latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta))
+            nearby = []
+            for name, lat, lon in cur.fetchall():
+                distance = haversine_km(latitude, longitude, float(lat), float(lon))
+                if distance <= radius_km:
+                    nearby.append((name, round(distance, 1)))
+            return sorted(nearby, key=lambda item: item[1])
+        finally:
+            cur.close()
+            conn.close()
+    
     def _get_schema(self) -> str:
         """Get the database schema"""
         return f"""
@@ -62,7 +96,7 @@ class DatabaseAgent(BaseAgent):
             UNSAFE: <explanation>
             """
             
-            safety_check = self.llm.invoke([{"role": "user", "content": safety_prompt}])
+            safety_check = self.invoke_llm([{"role": "user", "content": safety_prompt}])
             if safety_check.content.startswith("UNSAFE"):
                 return [], f"Query rejected: {safety_check.content}"
             
@@ -145,6 +179,11 @@ class DatabaseAgent(BaseAgent):
                 json_str = query[start:end]
                 location_data = json.loads(json_str)
                 
+                # Refuse duplicates the schema doesn't prevent ("Bend OR" vs "Bend, Oregon")
+                existing = LocationIndex(self.get_location_names()).find(location_data["name"])
+                if existing:
+                    return f"{existing} is already in the database; not adding {location_data['name']}."
+                
                 # Insert into database
                 success = self.add_location(location_data)
                 if success:
@@ -1,19 +1,31 @@
 from .base_agent import BaseAgent
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import copy
 import json
+import os
 from schema.database_schema import (
     LOCATIONS_SCHEMA,
     ACTIVITY_SCORES_SCHEMA,
     VALID_ACTIVITIES,
     get_location_template
 )
+from utils.dedup_stats import get_dedup_stats
+from utils.location_names import canonical_location_key, LocationIndex
+from utils.single_flight import get_single_flight
 
 class ResearchAgent(BaseAgent):
-    def __init__(self, anthropic_api_key: str, db_agent=None, model: str = "claude-3-5-sonnet-20240620"):
-        super().__init__(anthropic_api_key=anthropic_api_key, model=model)
+    def __init__(self, anthropic_api_key: str, db_agent=None, job_queue=None, model: str = "claude-3-5-sonnet-20240620", llm_factory=None,
+                 session_state=None, dedup_radius_km: Optional[float] = None):
+        super().__init__(anthropic_api_key=anthropic_api_key, model=model, llm_factory=llm_factory)
         self.known_locations = []
         self.schema = self._get_schema()
         self.db_agent = db_agent  # Store reference to database agent
+        self.job_queue = job_queue  # Research runs on workers when a queue is configured
+        self.research_flight = get_single_flight("research")
+        self.session_state = session_state  # Defaults to Streamlit's session state
+        self.dedup_stats = get_dedup_stats()
+        # Existing towns closer than this to researched coordinates are flagged as likely duplicates
+        self.dedup_radius_km = dedup_radius_km if dedup_radius_km is not None else float(os.getenv("DEDUP_RADIUS_KM", "10"))
     
     def _get_schema(self) -> str:
         """Get the database schema to ensure research matches required format"""
@@ -28,6 +40,14 @@ class ResearchAgent(BaseAgent):
         {', '.join(VALID_ACTIVITIES)}
         """
     
+    @property
+    def state(self):
+        """Per-session state shared with the router"""
+        if self.session_state is not None:
+            return self.session_state
+        import streamlit as st
+        return st.session_state
+    
     @property
     def capabilities(self) -> str:
         return """
@@ -78,7 +98,7 @@ class ResearchAgent(BaseAgent):
         "how do I use this?" -> "help:"
         """
         
-        response = self.llm.invoke([{"role": "user", "content": prompt}])
+        response = self.invoke_llm([{"role": "user", "content": prompt}])
         result = response.content.strip().split(":", 1)
         command = result[0].strip().lower()
         parameter = result[1].strip() if len(result) > 1 else ""
@@ -100,7 +120,7 @@ class ResearchAgent(BaseAgent):
         """
         
         try:
-            response = self.llm.invoke([{"role": "user", "content": prompt}])
+            response = self.invoke_llm([{"role": "user", "content": prompt}])
             suggested_location = response.content.strip()
             return suggested_location
         except Exception as e:
@@ -152,35 +172,106 @@ class ResearchAgent(BaseAgent):
             except:
                 pass
             
-            # Check if location is already in database
-            if location_name.lower() in [loc.lower() for loc in self.known_locations]:
-                return f"{location_name} is already in the database. Would you like me to suggest a different location?"
+            # Check if location is already in database before spending a research call
+            existing = self.find_existing_location(location_name)
+            if existing:
+                self.dedup_stats.record_saved()
+                return f"{existing} is already in the database. Would you like me to suggest a different location?"
+            
+            if self.job_queue:
+                try:
+                    job_id = self.job_queue.enqueue(location_name, self.state.get("session_id"))
+                    return f"{self.supersede_pending()}I've queued research for {location_name} (job #{job_id}). I'll show the results here when they're ready."
+                except Exception as e:
+                    return f"Error queueing research: {str(e)}"
                 
             try:
                 data = self.prepare_location_data(location_name)
-                formatted_json = json.dumps(data, indent=2)
-                
-                # Store in session state
-                import streamlit as st
-                st.session_state.pending_location = data
-                
-                return f"""I've researched {location_name}. Here's what I found:\n\n{formatted_json}\n\nWould you like me to add this to the database?"""
+                return self.supersede_pending() + self.stage_result(location_name, data)
             except Exception as e:
                 return f"Error researching location: {str(e)}"
         
         # Handle confirmation responses
         if any(word in query for word in ["yes", "sure", "okay", "add", "confirm"]):
-            import streamlit as st
-            if "pending_location" in st.session_state:
-                location_data = st.session_state.pending_location
+            if "pending_location" in self.state:
+                location_data = self.state["pending_location"]
                 return f"Added {location_data['name']} to the database."
             else:
                 return "No pending location to add. Try researching a location first."
         
         return "I don't understand that command. Type 'help' to see available commands."
     
+    def stage_result(self, location_name: str, data: Dict[str, Any], job_id: Optional[int] = None) -> str:
+        """Store researched data for confirmation and return the message showing it.
+
+        `job_id` is the queued job the data came from; it is marked delivered
+        once the result is confirmed or declined. Likely duplicates are flagged
+        here, and only here, so confirming the result inserts it directly.
+        """
+        self.state["pending_location"] = data
+        if job_id is None:
+            self.state.pop("pending_job_id", None)
+        else:
+            self.state["pending_job_id"] = job_id
+        formatted_json = json.dumps(data, indent=2)
+        return f"""I've researched {location_name}. Here's what I found:\n\n{formatted_json}\n\n{self.duplicate_warning(data)}Would you like me to add this to the database?"""
+    
+    def drop_pending(self) -> Optional[str]:
+        """Discard the result awaiting confirmation and return its name, or None if there was none"""
+        data = self.state.pop("pending_location", None)
+        job_id = self.state.pop("pending_job_id", None)
+        if job_id is not None and self.job_queue:
+            try:
+                self.job_queue.mark_delivered(job_id)
+            except Exception:
+                pass  # At worst the result is offered again after a reconnect
+        return data["name"] if data else None
+    
+    def supersede_pending(self) -> str:
+        """Drop an unconfirmed result because new research was requested; returns a note for the reply"""
+        dropped = self.drop_pending()
+        return f"I've dropped the unconfirmed result for {dropped}. " if dropped else ""
+    
+    def find_existing_location(self, location_name: str) -> Optional[str]:
+        """Catalog name matching location_name after canonicalization, or None"""
+        return LocationIndex(self.known_locations).find(location_name)
+    
+    def find_nearby_locations(self, data: Dict[str, Any]) -> List[tuple]:
+        """Existing towns within dedup_radius_km of researched coordinates"""
+        if not self.db_agent:
+            return []
+        nearby = self.db_agent.find_nearby_locations(data["latitude"], data["longitude"], self.dedup_radius_km)
+        if nearby:
+            self.dedup_stats.record_nearby()
+        return nearby
+    
+    def duplicate_warning(self, data: Dict[str, Any]) -> str:
+        """Warning text for likely duplicates of researched data, or an empty string"""
+        existing = self.find_existing_location(data["name"])
+        if existing:
+            return f"Warning: this looks like {existing}, which is already in the database.\n\n"
+        try:
+            nearby = self.find_nearby_locations(data)
+        except Exception:
+            return ""  # Don't block research results on the check
+        if not nearby:
+            return ""
+        towns = ", ".join(f"{name} ({distance} km)" for name, distance in nearby)
+        return f"Warning: existing towns within {self.dedup_radius_km:g} km: {towns}.\n\n"
+    
     def prepare_location_data(self, location_name: str) -> Dict[str, Any]:
-        """Prepare complete location data for database insertion"""
+        """Prepare complete location data for database insertion.
+
+        Concurrent requests for the same location share one research call.
+        """
+        data = self.research_flight.do(
+            canonical_location_key(location_name),
+            lambda: self._research_location(location_name)
+        )
+        return copy.deepcopy(data)
+    
+    def _research_location(self, location_name: str) -> Dict[str, Any]:
+        """Research a location with the LLM and validate the result"""
         template = get_location_template()
         
         prompt = f"""
@@ -202,7 +293,7 @@ class ResearchAgent(BaseAgent):
         """
         
         try:
-            response = self.llm.invoke([{"role": "user", "content": prompt}])
+            response = self.invoke_llm([{"role": "user", "content": prompt}])
             data = json.loads(response.content)
             
             # Add response to history
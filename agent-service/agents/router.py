@@ -0,0 +1,108 @@
+from typing import MutableMapping
+import json
+import re
+from .base_agent import BaseAgent
+from .db_agent import DatabaseAgent
+from .research_agent import ResearchAgent
+
+# Whole words that decline a result awaiting confirmation
+DECLINE_WORDS = {"no", "nope", "don't", "cancel", "skip", "discard", "decline"}
+
+def route_query(query: str, base_agent: BaseAgent, db_agent: DatabaseAgent,
+                research_agent: ResearchAgent, state: MutableMapping) -> str:
+    """Route the query to the appropriate agent.
+
+    `state` is the per-session state (Streamlit's session state in the app).
+    """
+    agents = {
+        'database': db_agent,
+        'research': research_agent
+    }
+
+    query = query.lower()
+    
+    # Database queries
+    db_phrases = ["what cities", "list all", "show all", "in the database", "locations", "cities included"]
+    if any(phrase in query for phrase in db_phrases):
+        return db_agent.process(query)
+    
+    # Handle update/replace requests
+    replace_phrases = ["replace", "update", "redo", "refresh"]
+    if any(phrase in query for phrase in replace_phrases):
+        # Extract location name
+        location = query
+        for phrase in replace_phrases + ["entry", "with", "new", "research"]:
+            location = location.replace(phrase, "")
+        location = location.strip()
+        
+        # If no location specified, check if there's a pending operation
+        if not location and "last_location" in state:
+            location = state["last_location"]
+        
+        if location:
+            # Store for potential follow-up
+            state["last_location"] = location
+            
+            # First delete the existing entry
+            delete_result = db_agent.process(f"delete {location}")
+            if "not found" in delete_result.lower() or "error" in delete_result.lower():
+                return delete_result
+                
+            # Then research and add as new
+            return research_agent.process(f"research {location}")
+            
+        return "Please specify which location to replace/update."
+    
+    # Direct routing for research patterns
+    if query.startswith("research") or "research" in query:
+        # Store the location being researched
+        location = query.replace("research", "").strip()
+        if location:
+            state["last_location"] = location
+        return research_agent.process(query)
+        
+    # Handle declining a pending result; checked before confirmation so "no, don't add it" declines
+    if "pending_location" in state and DECLINE_WORDS & set(re.findall(r"[a-z']+", query)):
+        return f"OK, I won't add {research_agent.drop_pending()}."
+    
+    # Handle confirmation and database addition
+    if any(word in query.lower() for word in ["yes", "add", "confirm"]):
+        if "pending_location" in state:
+            data = state["pending_location"]
+            # Likely duplicates were flagged when the result was shown (see
+            # ResearchAgent.stage_result); exact ones are refused by the database agent.
+            # Clean up session state after use
+            research_agent.drop_pending()
+            return db_agent.process(f"add to the database: {json.dumps(data)}")
+        else:
+            return research_agent.process(query)  # Let research agent handle suggestions
+    
+    # Handle delete/remove requests
+    if any(cmd in query for cmd in ["delete", "remove"]):
+        return db_agent.process(query)
+    
+    # Route to research agent for suggestions
+    suggestion_phrases = ["what city should", "what town should", "suggest", "recommendation"]
+    if any(phrase in query for phrase in suggestion_phrases):
+        return research_agent.process(query)
+    
+    # Default routing through LLM
+    routing_prompt = f"""
+    Given this user query: "{query}"
+    
+    Which agent should handle this request?
+    
+    Available agents:
+    1. database: {db_agent.capabilities}
+    2. research: {research_agent.capabilities}
+    
+    Reply with just the agent name (database or research).
+    """
+    
+    response = base_agent.invoke_llm([{"role": "user", "content": routing_prompt}])
+    selected_agent = response.content.strip().lower()
+    
+    if selected_agent not in agents:
+        return f"I'm sorry, I couldn't determine how to handle: '{query}'. Try asking about cities in the database or researching a specific location."
+    
+    return agents[selected_agent].process(query)
@@ -0,0 +1,299 @@
+"""Read-only HTTP API for locations and activity scores.
+
+    python -m api.read_api --port 8000
+
+GET /locations supports:
+- fields=id,name,latitude,longitude,scores   field projection (id is always included)
+- limit=100&after=<id>                       keyset pagination; follow `next_after`
+- bbox=min_lon,min_lat,max_lon,max_lat       map viewport filter
+
+GET /version returns the catalog version. Responses carry an ETag derived from
+the catalog version, so an unchanged catalog answers If-None-Match with a 304.
+Bodies are compressed with brotli (if installed) or gzip.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from utils.env_loader import load_env_vars, get_db_config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LOCATION_FIELDS = ["id", "name", "latitude", "longitude", "description", "activities", "created_at", "updated_at"]
+DEFAULT_FIELDS = ["id", "name", "latitude", "longitude"]
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+MIN_COMPRESS_BYTES = 1024
+
+SCORES_COLUMN = """
+    COALESCE((
+        SELECT json_object_agg(s.activity_type, s.score)
+        FROM activity_scores s WHERE s.location_id = l.id
+    ), '{}'::json) AS scores
+"""
+
+class ApiEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return super(ApiEncoder, self).default(obj)
+
+class BadRequest(ValueError):
+    pass
+
+class PoolBusy(Exception):
+    """No database connection became free in time"""
+
+def parse_location_params(query: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Validate /locations query parameters"""
+    def single(name: str) -> Optional[str]:
+        values = query.get(name)
+        return values[-1] if values else None
+
+    fields = DEFAULT_FIELDS
+    if single("fields"):
+        fields = [f.strip() for f in single("fields").split(",") if f.strip()]
+        unknown = [f for f in fields if f not in LOCATION_FIELDS + ["scores"]]
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in fields:
+            fields = ["id"] + fields
+
+    try:
+        limit = int(single("limit") or DEFAULT_LIMIT)
+        after = int(single("after") or 0)
+    except ValueError:
+        raise BadRequest("limit and after must be integers")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {MAX_LIMIT}")
+
+    bbox = None
+    if single("bbox"):
+        try:
+            bbox = [float(v) for v in single("bbox").split(",")]
+        except ValueError:
+            raise BadRequest("bbox must be min_lon,min_lat,max_lon,max_lat")
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise BadRequest("bbox must be min_lon,min_lat,max_lon,max_lat")
+
+    return {"fields": fields, "limit": limit, "after": after, "bbox": bbox}
+
+def build_locations_query(params: Dict[str, Any]) -> Tuple[str, list]:
+    """SQL and arguments for one keyset page of locations"""
+    columns = [f"l.{f}" for f in params["fields"] if f != "scores"]
+    if "scores" in params["fields"]:
+        columns.append(SCORES_COLUMN)
+
+    where = ["l.id > %s"]
+    args: list = [params["after"]]
+    if params["bbox"]:
+        min_lon, min_lat, max_lon, max_lat = params["bbox"]
+        where.append("l.latitude BETWEEN %s AND %s AND l.longitude BETWEEN %s AND %s")
+        args += [min_lat, max_lat, min_lon, max_lon]
+
+    # Fetch one extra row to learn whether another page exists
+    args.append(params["limit"] + 1)
+    sql = f"""
+        SELECT {', '.join(columns)}
+        FROM locations l
+        WHERE {' AND '.join(where)}
+        ORDER BY l.id
+        LIMIT %s
+    """
+    return sql, args
+
+def make_etag(version: int, path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Weak ETag: the catalog version plus a hash of the normalized request"""
+    request = json.dumps([path, params], sort_keys=True)
+    return f'W/"{version}-{hashlib.sha1(request.encode()).hexdigest()[:12]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: ignore the W/ prefix
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        pieces = part.strip().split(";")
+        name = pieces[0].strip().lower()
+        q = 1.0
+        for piece in pieces[1:]:
+            if piece.strip().startswith("q="):
+                try:
+                    q = float(piece.strip()[2:])
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class LocationReader:
+    """Reads catalog data from a connection pool.
+
+    The server starts a thread per connection, but the pool raises when it is
+    empty, so requests queue on a semaphore sized to the pool instead.
+    """
+
+    def __init__(self, db_config: dict, min_connections: int = 1, max_connections: int = 10,
+                 acquire_timeout: float = 10.0):
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, **db_config)
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.acquire_timeout = acquire_timeout
+
+    def _begin(self, cur):
+        # Version and rows come from the same snapshot, so the ETag matches the body
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cur.execute("SELECT version FROM catalog_version")
+        return cur.fetchone()[0]
+
+    def read(self, etag_for, if_none_match: Optional[str], sql: Optional[str] = None,
+             args: Optional[list] = None) -> Tuple[str, Optional[List[Dict[str, Any]]], int]:
+        """Return (etag, rows, version); rows is None when the client's ETag still matches"""
+        if not self.slots.acquire(timeout=self.acquire_timeout):
+            raise PoolBusy(f"No database connection free after {self.acquire_timeout}s")
+        try:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    version = self._begin(cur)
+                    etag = etag_for(version)
+                    if etag_matches(if_none_match, etag) or sql is None:
+                        return etag, None, version
+                    cur.execute(sql, args)
+                    columns = [desc[0] for desc in cur.description]
+                    return etag, [dict(zip(columns, row)) for row in cur.fetchall()], version
+            finally:
+                broken = False
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True  # E.g. the server restarted; don't pool this connection again
+                # Always return the connection, or the pool runs dry after enough failures
+                self.pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self.slots.release()
+
+class ReadApiHandler(BaseHTTPRequestHandler):
+    reader: LocationReader = None
+    cors_origin: Optional[str] = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path == "/locations":
+                self._get_locations(parse_qs(url.query))
+            elif url.path == "/version":
+                self._get_version()
+            else:
+                self._send_json(404, {"status": "error", "message": "Not found"})
+        except BadRequest as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+        except PoolBusy as e:
+            self.log_error("Error handling %s: %s", self.path, e)
+            self._send_json(503, {"status": "error", "message": "Server busy, try again"}, retry_after=1)
+        except Exception as e:
+            self.log_error("Error handling %s: %s", self.path, e)
+            self._send_json(500, {"status": "error", "message": "Error fetching locations"})
+
+    def _get_locations(self, query: Dict[str, List[str]]):
+        params = parse_location_params(query)
+        sql, args = build_locations_query(params)
+        etag, rows, version = self.reader.read(
+            lambda v: make_etag(v, "/locations", params), self.headers.get("If-None-Match"), sql, args
+        )
+        if rows is None:
+            return self._send_not_modified(etag)
+
+        has_more = len(rows) > params["limit"]
+        rows = rows[:params["limit"]]
+        self._send_json(200, {
+            "status": "success",
+            "data": rows,
+            "next_after": rows[-1]["id"] if has_more else None,
+            "version": version
+        }, etag)
+
+    def _get_version(self):
+        etag, _, version = self.reader.read(lambda v: make_etag(v, "/version"), self.headers.get("If-None-Match"))
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            return self._send_not_modified(etag)
+        self._send_json(200, {"status": "success", "version": version}, etag)
+
+    def _common_headers(self, etag: Optional[str]):
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # Always revalidate; 304s are cheap
+        self.send_header("Vary", "Accept-Encoding")
+        if self.cors_origin:
+            self.send_header("Access-Control-Allow-Origin", self.cors_origin)
+            self.send_header("Access-Control-Expose-Headers", "ETag")
+
+    def _send_not_modified(self, etag: str):
+        self.send_response(304)
+        self._common_headers(etag)
+        self.end_headers()
+
+    def _send_json(self, status: int, payload: Dict[str, Any], etag: Optional[str] = None,
+                   retry_after: Optional[int] = None):
+        body = json.dumps(payload, cls=ApiEncoder, separators=(",", ":")).encode()
+        encoding = choose_encoding(self.headers.get("Accept-Encoding", "")) if len(body) >= MIN_COMPRESS_BYTES else None
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self._common_headers(etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve read-only location data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-connections", type=int, default=10, help="Database connection pool size")
+    parser.add_argument("--acquire-timeout", type=float, default=10.0,
+                        help="Seconds a request waits for a free connection before answering 503")
+    parser.add_argument("--cors-origin", help="Value for Access-Control-Allow-Origin, e.g. http://localhost:3000")
+    args = parser.parse_args()
+
+    load_env_vars()
+    ReadApiHandler.reader = LocationReader(get_db_config(), max_connections=args.max_connections,
+                                           acquire_timeout=args.acquire_timeout)
+    ReadApiHandler.cors_origin = args.cors_origin
+
+    server = ThreadingHTTPServer((args.host, args.port), ReadApiHandler)
+    print(f"Serving read API on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
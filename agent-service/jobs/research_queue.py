@@ -0,0 +1,267 @@
+import psycopg2
+import json
+import random
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from utils.location_names import canonical_location_key
+
+# Job lifecycle: queued -> running -> done
+#                           \-> queued (retry with backoff) -> ... -> failed
+# Finished jobs are stamped with delivered_at once their session has answered
+# them (confirmed or declined a result, or been shown an error). Until then
+# they are offered again, e.g. to a reconnected browser with the same session id.
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class ResearchJobQueue:
+    """Postgres-backed queue of location research jobs.
+
+    Workers claim jobs with FOR UPDATE SKIP LOCKED, so any number of worker
+    processes (on any number of machines) can share the same table.
+    """
+
+    def __init__(self, db_config: dict, visibility_timeout: int = 300,
+                 max_attempts: int = 3, backoff_base: float = 5.0, backoff_max: float = 300.0):
+        self.db_config = db_config
+        self.visibility_timeout = visibility_timeout  # seconds a claimed job stays invisible
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _backoff_seconds(self, attempts: int) -> float:
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** max(attempts - 1, 0)))
+        return random.uniform(0, ceiling)
+
+    def enqueue(self, location_name: str, session_id: Optional[str] = None) -> int:
+        """Add a research job and return its id"""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO research_jobs (location_name, location_key, session_id, status, max_attempts)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
+            """, (location_name, canonical_location_key(location_name), session_id, QUEUED, self.max_attempts))
+            job_id = cur.fetchone()[0]
+            conn.commit()
+            return job_id
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Claim the next runnable job, or return None if the queue is empty.
+
+        A job is runnable when it is queued and its backoff has elapsed, or when
+        it is running but its worker let the visibility timeout lapse.
+        """
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE research_jobs
+                SET status = %s,
+                    attempts = attempts + 1,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM research_jobs
+                    WHERE (status = %s AND run_after <= CURRENT_TIMESTAMP)
+                       OR (status = %s AND locked_until < CURRENT_TIMESTAMP)
+                    ORDER BY run_after, id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, location_name, location_key, session_id, attempts, max_attempts, created_at
+            """, (RUNNING, self.visibility_timeout, QUEUED, RUNNING))
+            row = cur.fetchone()
+            conn.commit()
+            if not row:
+                return None
+            columns = [desc[0] for desc in cur.description]
+            return dict(zip(columns, row))
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def complete(self, job_id: int, attempts: int, result: Dict[str, Any]) -> bool:
+        """Store validated research results for confirmation.
+
+        Returns False if the claim expired and another worker took the job over.
+        """
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE research_jobs
+                SET status = %s, result = %s, error = NULL,
+                    locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = %s AND attempts = %s
+            """, (DONE, json.dumps(result), job_id, RUNNING, attempts))
+            owned = cur.rowcount == 1
+            conn.commit()
+            return owned
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def extend(self, job_id: int, attempts: int) -> bool:
+        """Push a running job's visibility timeout out by another `visibility_timeout` seconds.
+
+        Returns False if the claim already expired and another worker took the job over.
+        """
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE research_jobs
+                SET locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = %s AND attempts = %s
+            """, (self.visibility_timeout, job_id, RUNNING, attempts))
+            owned = cur.rowcount == 1
+            conn.commit()
+            return owned
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def fail(self, job_id: int, error: str, attempts: int, max_attempts: int) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried."""
+        retry = attempts < max_attempts
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE research_jobs
+                SET status = %s, error = %s, locked_until = NULL,
+                    run_after = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = %s AND attempts = %s
+            """, (QUEUED if retry else FAILED, error,
+                  self._backoff_seconds(attempts) if retry else 0, job_id, RUNNING, attempts))
+            conn.commit()
+            return retry
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def recent_result(self, location_key: str, finished_after: datetime) -> Optional[Dict[str, Any]]:
+        """Most recent result for a location finished after `finished_after`, if any"""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT result FROM research_jobs
+                WHERE location_key = %s AND status = %s
+                  AND updated_at > %s
+                ORDER BY updated_at DESC
+                LIMIT 1
+            """, (location_key, DONE, finished_after))
+            row = cur.fetchone()
+            return row[0] if row else None
+        finally:
+            cur.close()
+            conn.close()
+
+    def collect_finished(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return up to `limit` finished (done or failed) jobs for a session that
+        have not been answered yet, oldest first. Call mark_delivered once answered."""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT id, location_name, status, result, error FROM research_jobs
+                WHERE session_id = %s AND status IN (%s, %s) AND delivered_at IS NULL
+                ORDER BY id
+                LIMIT %s
+            """, (session_id, DONE, FAILED, limit))
+            columns = [desc[0] for desc in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+        finally:
+            cur.close()
+            conn.close()
+
+    def mark_delivered(self, job_id: int):
+        """Record that the session has answered a finished job, so it is not offered again"""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE research_jobs
+                SET delivered_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND delivered_at IS NULL
+            """, (job_id,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+            conn.close()
+
+    def pending_count(self, session_id: str, exclude_job_id: Optional[int] = None) -> int:
+        """Number of jobs for a session whose results have not been answered yet,
+        not counting `exclude_job_id` (the result currently shown)"""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT COUNT(*) FROM research_jobs
+                WHERE session_id = %s AND delivered_at IS NULL AND id IS DISTINCT FROM %s
+            """, (session_id, exclude_job_id))
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+            conn.close()
+
+class JobLease:
+    """Keeps a claimed job invisible to other workers while it runs.
+
+    Extends the visibility timeout every third of it in a background thread,
+    so research that outlasts one timeout (LLM retries and backoff) is not
+    reclaimed and run twice. Stops once the job is finished or taken over.
+    """
+
+    def __init__(self, queue: ResearchJobQueue, job: Dict[str, Any]):
+        self.queue = queue
+        self.job = job
+        self.interval = queue.visibility_timeout / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-lease-{job['id']}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.extend(self.job["id"], self.job["attempts"]):
+                    return
+            except Exception:
+                pass  # Try again next interval; the lease still has two thirds left
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
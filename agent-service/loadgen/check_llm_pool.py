@@ -0,0 +1,76 @@
+"""Check that agents share one keep-alive LLM connection, using a local stub server.
+
+    python -m loadgen.check_llm_pool
+
+Starts a stub of the Anthropic messages endpoint on localhost, sends several
+calls from two different agents through one LLMClientFactory and verifies
+they were all sent through the factory's own httpx client and arrived over a
+single TCP connection. Exits non-zero otherwise.
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents.base_agent import BaseAgent
+from agents.research_agent import ResearchAgent
+from utils.llm_client import LLMClientFactory
+
+class StubMessagesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+        payload = json.dumps({
+            "id": f"msg_stub_{self.server.requests}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": "yes"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    """Counts accepted TCP connections and handled requests"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubMessagesHandler)
+        self.connections = 0
+        self.requests = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+def check_shared_pool(calls: int = 6) -> bool:
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    factory = LLMClientFactory("stub-key", base_url=f"http://127.0.0.1:{server.server_port}", http2=False)
+    try:
+        agents = [BaseAgent(anthropic_api_key="stub-key", llm_factory=factory),
+                  ResearchAgent(anthropic_api_key="stub-key", llm_factory=factory, session_state={})]
+        for i in range(calls):
+            # Distinct prompts so single-flight never merges calls
+            agents[i % len(agents)].invoke_llm([{"role": "user", "content": f"pool check {i}"}])
+    finally:
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
+    print(f"{server.requests} requests over {server.connections} connection(s), "
+          f"{factory.requests_sent} sent through the shared pool")
+    return server.requests == calls and factory.requests_sent == calls and server.connections == 1
+
+if __name__ == "__main__":
+    sys.exit(0 if check_shared_pool() else 1)
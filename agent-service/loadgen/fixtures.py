@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from agents.base_agent import prompt_key
+
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+def _lock_for(path: str) -> threading.Lock:
+    """Process-wide lock for appending to `path`.
+
+    Streamlit reruns build a new RecordingFactory each time, so the lock can't
+    live on the factory without concurrent sessions interleaving records.
+    """
+    path = os.path.abspath(path)
+    with _path_locks_lock:
+        if path not in _path_locks:
+            _path_locks[path] = threading.Lock()
+        return _path_locks[path]
+
+class RecordingLLM:
+    """Wraps a chat model and appends every prompt/response pair to a JSONL fixture"""
+
+    def __init__(self, llm, path: str, lock: threading.Lock):
+        self.llm = llm
+        self.model = getattr(llm, "model", "")
+        self.path = path
+        self._lock = lock
+
+    def invoke(self, messages: List[Dict[str, str]]):
+        start = time.perf_counter()
+        response = self.llm.invoke(messages)
+        record = {
+            "key": prompt_key(self.model, messages),
+            "model": self.model,
+            "messages": messages,
+            "response": response.content,
+            "latency": round(time.perf_counter() - start, 4),
+            "usage": getattr(response, "usage_metadata", None)
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+        return response
+
+class RecordingFactory:
+    """LLM client factory that records all calls made through `factory`"""
+
+    def __init__(self, factory, path: str):
+        self.factory = factory
+        self.path = path
+        self._lock = _lock_for(path)
+
+    def chat_model(self, model: str) -> RecordingLLM:
+        return RecordingLLM(self.factory.chat_model(model), self.path, self._lock)
+
+class ReplayResponse:
+    """Minimal stand-in for the chat model's message response"""
+
+    def __init__(self, content: str, usage_metadata: Optional[Dict[str, Any]] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+class ReplayLLM:
+    """Answers prompts from a recorded fixture, sleeping a realistic latency"""
+
+    def __init__(self, fixture: "Fixture", model: str):
+        self.fixture = fixture
+        self.model = model
+
+    def invoke(self, messages: List[Dict[str, str]]) -> ReplayResponse:
+        record = self.fixture.lookup(prompt_key(self.model, messages))
+        time.sleep(self.fixture.sample_latency(record))
+        return ReplayResponse(record["response"], record.get("usage"))
+
+class Fixture:
+    """Recorded prompt/response pairs indexed by prompt key.
+
+    Repeated prompts cycle through their recorded responses. Prompts missing
+    from the fixture get a random recorded response and are counted in
+    `misses`, so a low hit rate shows the fixture needs re-recording.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0, jitter: float = 0.25, seed: Optional[int] = None):
+        self.records: List[Dict[str, Any]] = []
+        self.by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records.append(record)
+                    self.by_key[record["key"]].append(record)
+        if not self.records:
+            raise ValueError(f"No recorded calls in {path}")
+
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            records = self.by_key.get(key)
+            if not records:
+                self.misses += 1
+                return self._random.choice(self.records)
+            self.hits += 1
+            record = records[self._next[key] % len(records)]
+            self._next[key] += 1
+            return record
+
+    def sample_latency(self, record: Dict[str, Any]) -> float:
+        """Recorded latency scaled and perturbed with log-normal noise"""
+        with self._lock:
+            noise = self._random.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        return record["latency"] * self.latency_scale * noise
+
+class ReplayFactory:
+    """LLM client factory whose models replay a fixture instead of calling the API"""
+
+    def __init__(self, fixture: Fixture):
+        self.fixture = fixture
+
+    def chat_model(self, model: str) -> ReplayLLM:
+        return ReplayLLM(self.fixture, model)
@@ -0,0 +1,235 @@
+"""Replay recorded LLM traffic through N concurrent simulated chat sessions.
+
+Record a fixture by running the app with LLM_RECORD_PATH set, then:
+
+    python -m loadgen.run --fixture llm_fixture.jsonl --sessions 1,2,4,8,16
+
+Each session gets its own agents and session state and sends the script's
+queries through the same router as the Streamlit app, against the database
+configured in the environment. Research runs inline (no job queue).
+Every level gets a fresh rate limiter (configured like the app's, from the
+environment) and fresh single-flight groups, so levels don't share budget or
+coalesce with each other; --no-rate-limit and --no-coalesce bypass them.
+Scripts must be read-only unless --allow-writes is given, so every level
+runs against the same data.
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from typing import Any, Dict, List
+import psycopg2
+from agents import router
+from agents.base_agent import BaseAgent
+from agents.db_agent import DatabaseAgent
+from agents.research_agent import ResearchAgent
+from loadgen.fixtures import Fixture, ReplayFactory
+from utils.dedup_stats import get_dedup_stats
+from utils.env_loader import load_env_vars, get_db_config
+from utils.rate_limiter import RateLimiter, rate_limiter_from_env
+from utils.single_flight import SingleFlight
+
+DEFAULT_SCRIPT = [
+    "what cities are in the database",
+    "suggest a new town to visit",
+    "research Bend, Oregon",
+    "what can you do",
+]
+
+# Substrings the router treats as confirm/add, replace or delete requests
+WRITE_WORDS = ["yes", "add", "confirm", "replace", "update", "redo", "refresh", "delete", "remove"]
+
+def writing_queries(script: List[str]) -> List[str]:
+    """Queries the router would turn into database writes"""
+    return [query for query in script if any(word in query.lower() for word in WRITE_WORDS)]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class ConnectionSampler:
+    """Samples the number of open connections to the database in the background"""
+
+    def __init__(self, db_config: dict, interval: float = 0.1):
+        self.db_config = db_config
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="connection-sampler", daemon=True)
+
+    def _run(self):
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            while not self._stop.is_set():
+                cur.execute("""
+                    SELECT COUNT(*) FROM pg_stat_activity
+                    WHERE datname = current_database() AND pid <> pg_backend_pid()
+                """)
+                self.samples.append(cur.fetchone()[0])
+                self._stop.wait(self.interval)
+        finally:
+            cur.close()
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+def new_flights() -> Dict[str, SingleFlight]:
+    return {"prompts": SingleFlight(), "research": SingleFlight()}
+
+def run_session(script: List[str], turns: int, db_config: dict, llm_factory: ReplayFactory,
+                limiter: RateLimiter, flights: Dict[str, SingleFlight],
+                latencies: List[float], errors: List[str], lock: threading.Lock):
+    """Drive one simulated chat session through the router"""
+    # Fresh state per session, so no pending location carries over between levels
+    state: Dict[str, Any] = {}
+    base_agent = BaseAgent(anthropic_api_key="replay", llm_factory=llm_factory)
+    db_agent = DatabaseAgent(anthropic_api_key="replay", db_config=db_config, llm_factory=llm_factory)
+    research_agent = ResearchAgent(anthropic_api_key="replay", db_agent=db_agent,
+                                   llm_factory=llm_factory, session_state=state)
+    # Use the level's limiter and flights instead of the process-wide ones
+    for agent in (base_agent, db_agent, research_agent):
+        agent.rate_limiter = limiter
+        agent.prompt_flight = flights["prompts"]
+    research_agent.research_flight = flights["research"]
+    research_agent.known_locations = db_agent.get_location_names()
+
+    for turn in range(turns):
+        query = script[turn % len(script)]
+        start = time.perf_counter()
+        try:
+            router.route_query(query, base_agent, db_agent, research_agent, state)
+        except Exception as e:
+            with lock:
+                errors.append(f"{query}: {e}")
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+def run_level(sessions: int, script: List[str], turns: int, db_config: dict, llm_factory: ReplayFactory,
+              limiter: RateLimiter, coalesce: bool = True) -> Dict[str, Any]:
+    """Run `sessions` concurrent sessions and summarize the results.
+
+    Sessions share `limiter`; with `coalesce` they also share single-flight
+    groups, otherwise each session gets its own and nothing is merged across sessions.
+    """
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    shared = new_flights()
+    session_flights = [shared if coalesce else new_flights() for _ in range(sessions)]
+    threads = [
+        threading.Thread(target=run_session, args=(script, turns, db_config, llm_factory, limiter,
+                                                   flights, latencies, errors, lock))
+        for flights in session_flights
+    ]
+
+    with ConnectionSampler(db_config) as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+    connections = sampler.samples or [0]
+    flight_stats = {}
+    for name in shared:
+        groups = [shared] if coalesce else session_flights
+        stats = [flights[name].stats() for flights in groups]
+        flight_stats[name] = {field: sum(stat[field] for stat in stats) for field in ("executed", "coalesced")}
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "db_connections_peak": max(connections),
+        "db_connections_mean": round(sum(connections) / len(connections), 1),
+        "limits": dict(limiter.limits(), coalesce=coalesce),
+        "rate_limiter": limiter.stats(),
+        "single_flight": flight_stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agent router with replayed LLM traffic")
+    parser.add_argument("--fixture", required=True, help="JSONL fixture recorded with LLM_RECORD_PATH")
+    parser.add_argument("--sessions", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=8, help="Turns per session")
+    parser.add_argument("--script", help="File with one user query per line (default: built-in read-only script)")
+    parser.add_argument("--allow-writes", action="store_true",
+                        help="Allow script queries that add, replace or delete locations (they change later levels)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded LLM latency")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Log-normal sigma applied to recorded latency")
+    parser.add_argument("--seed", type=int, help="Random seed for latency sampling")
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="Bypass the LLM rate limiter (unlimited requests, tokens and concurrency)")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Don't coalesce identical prompts or research across sessions")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    load_env_vars()
+    db_config = get_db_config()
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as f:
+            script = [line.strip() for line in f if line.strip()]
+    writes = writing_queries(script)
+    if writes and not args.allow_writes:
+        parser.error(f"script would write to the database ({writes[0]!r}); pass --allow-writes to run it anyway")
+
+    fixture = Fixture(args.fixture, latency_scale=args.latency_scale, jitter=args.jitter, seed=args.seed)
+    llm_factory = ReplayFactory(fixture)
+
+    results = []
+    for sessions in [int(level) for level in args.sessions.split(",")]:
+        hits, misses = fixture.hits, fixture.misses
+        if args.no_rate_limit:
+            limiter = RateLimiter(requests_per_minute=math.inf, tokens_per_minute=math.inf,
+                                  max_concurrency=sessions, min_concurrency=sessions)
+        else:
+            limiter = rate_limiter_from_env()
+        result = run_level(sessions, script, args.turns, db_config, llm_factory, limiter,
+                           coalesce=not args.no_coalesce)
+        result["replay_hits"] = fixture.hits - hits
+        result["replay_misses"] = fixture.misses - misses
+        results.append(result)
+        if not args.json:
+            print(f"{result['sessions']:>8} sessions  {result['turns']:>5} turns  {result['errors']:>3} errors  "
+                  f"{result['throughput']:>7.2f} turns/s  p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  "
+                  f"p99 {result['p99']:.3f}s  db conns peak {result['db_connections_peak']} "
+                  f"mean {result['db_connections_mean']}", flush=True)
+            limits = result["limits"]
+            print(f"{'':>8} limits: {limits['requests_per_minute']} req/min, {limits['tokens_per_minute']} tokens/min, "
+                  f"concurrency {limits['max_concurrency']}, coalesce {'on' if limits['coalesce'] else 'off'}  "
+                  f"throttle wait {result['rate_limiter']['throttle_wait_seconds']}s  "
+                  f"coalesced {result['single_flight']['prompts']['coalesced']} prompts, "
+                  f"{result['single_flight']['research']['coalesced']} research", flush=True)
+
+    if args.json:
+        print(json.dumps({
+            "levels": results,
+            "dedup": get_dedup_stats().stats()
+        }, indent=2))
+    else:
+        print(f"Replay: {fixture.hits} hits, {fixture.misses} misses")
+        print(f"Duplicate detection: {get_dedup_stats().stats()}")
+
+if __name__ == "__main__":
+    main()
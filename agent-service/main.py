@@ -2,7 +2,16 @@ import streamlit as st
 from agents.db_agent import DatabaseAgent
 from agents.research_agent import ResearchAgent
 from agents.base_agent import BaseAgent
+from agents import router
+from loadgen.fixtures import RecordingFactory
+from jobs.research_queue import ResearchJobQueue
+from utils.llm_client import get_llm_factory
+from utils.profiler import SamplingProfiler
+from utils.single_flight import single_flight_stats
 import json
+import os
+import re
+import uuid
 
 # Initialize agents
 anthropic_api_key = st.secrets["ANTHROPIC_API_KEY"]
@@ -14,16 +23,15 @@ db_config = {
     "port": st.secrets["DB_PORT"]
 }
 
-# Initialize agents with shared knowledge
-base_agent = BaseAgent(anthropic_api_key=anthropic_api_key)
-db_agent = DatabaseAgent(anthropic_api_key=anthropic_api_key, db_config=db_config)
-research_agent = ResearchAgent(anthropic_api_key=anthropic_api_key, db_agent=db_agent)
-
-# Define available agents
-agents = {
-    'database': db_agent,
-    'research': research_agent
-}
+# Initialize agents with shared knowledge and one shared LLM connection pool
+llm_factory = get_llm_factory(anthropic_api_key)
+if os.getenv("LLM_RECORD_PATH"):
+    # Record prompt/response pairs as a load-test fixture (see loadgen/run.py)
+    llm_factory = RecordingFactory(llm_factory, os.getenv("LLM_RECORD_PATH"))
+base_agent = BaseAgent(anthropic_api_key=anthropic_api_key, llm_factory=llm_factory)
+db_agent = DatabaseAgent(anthropic_api_key=anthropic_api_key, db_config=db_config, llm_factory=llm_factory)
+job_queue = ResearchJobQueue(db_config)
+research_agent = ResearchAgent(anthropic_api_key=anthropic_api_key, db_agent=db_agent, job_queue=job_queue, llm_factory=llm_factory)
 
 # Initialize known locations
 research_agent.known_locations = db_agent.get_location_names()
@@ -32,6 +40,16 @@ research_agent.known_locations = db_agent.get_location_names()
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Session id ties queued research jobs to this browser session; keep it in the
+# URL so results survive a reconnect
+if "session_id" not in st.session_state:
+    session_id = st.query_params.get("session", "")
+    # Only accept ids we could have generated; research_jobs.session_id is VARCHAR(64)
+    if not re.fullmatch(r"[0-9a-f]{1,64}", session_id):
+        session_id = uuid.uuid4().hex
+    st.session_state.session_id = session_id
+    st.query_params["session"] = session_id
+
 st.title("Outdoor Towns Database Manager")
 
 # Sidebar for mode selection
@@ -40,91 +58,65 @@ mode = st.sidebar.selectbox(
     ["Chat Interface", "View Existing", "Add Suggestions"]
 )
 
+# Shared LLM rate limiter metrics, for sizing workers
+with st.sidebar.expander("LLM rate limiter"):
+    st.json(base_agent.rate_limiter.stats())
+    st.caption("Coalesced calls")
+    st.json(single_flight_stats())
+    st.caption("Duplicate detection")
+    st.json(research_agent.dedup_stats.stats())
+
 def route_query(query: str) -> str:
     """Route the query to the appropriate agent"""
-    query = query.lower()
-    
-    # Database queries
-    db_phrases = ["what cities", "list all", "show all", "in the database", "locations", "cities included"]
-    if any(phrase in query for phrase in db_phrases):
-        return db_agent.process(query)
-    
-    # Handle update/replace requests
-    replace_phrases = ["replace", "update", "redo", "refresh"]
-    if any(phrase in query for phrase in replace_phrases):
-        # Extract location name
-        location = query
-        for phrase in replace_phrases + ["entry", "with", "new", "research"]:
-            location = location.replace(phrase, "")
-        location = location.strip()
-        
-        # If no location specified, check if there's a pending operation
-        if not location and "last_location" in st.session_state:
-            location = st.session_state.last_location
-        
-        if location:
-            # Store for potential follow-up
-            st.session_state.last_location = location
-            
-            # First delete the existing entry
-            delete_result = db_agent.process(f"delete {location}")
-            if "not found" in delete_result.lower() or "error" in delete_result.lower():
-                return delete_result
-                
-            # Then research and add as new
-            return research_agent.process(f"research {location}")
-            
-        return "Please specify which location to replace/update."
-    
-    # Direct routing for research patterns
-    if query.startswith("research") or "research" in query:
-        # Store the location being researched
-        location = query.replace("research", "").strip()
-        if location:
-            st.session_state.last_location = location
-        return research_agent.process(query)
-        
-    # Handle confirmation and database addition
-    if any(word in query.lower() for word in ["yes", "add", "confirm"]):
-        if "pending_location" in st.session_state:
-            data = st.session_state.pending_location
-            # Clean up session state after use
-            del st.session_state.pending_location
-            return db_agent.process(f"add to the database: {json.dumps(data)}")
-        else:
-            return research_agent.process(query)  # Let research agent handle suggestions
-    
-    # Handle delete/remove requests
-    if any(cmd in query for cmd in ["delete", "remove"]):
-        return db_agent.process(query)
-    
-    # Route to research agent for suggestions
-    suggestion_phrases = ["what city should", "what town should", "suggest", "recommendation"]
-    if any(phrase in query for phrase in suggestion_phrases):
-        return research_agent.process(query)
-    
-    # Default routing through LLM
-    routing_prompt = f"""
-    Given this user query: "{query}"
-    
-    Which agent should handle this request?
-    
-    Available agents:
-    1. database: {db_agent.capabilities}
-    2. research: {research_agent.capabilities}
-    
-    Reply with just the agent name (database or research).
+    return router.route_query(query, base_agent, db_agent, research_agent, st.session_state)
+
+def collect_research_results():
+    """Move the next finished research job for this session into the chat.
+
+    Only one result can await confirmation at a time, so nothing is delivered
+    until the pending one is confirmed, declined or dropped for new research.
     """
-    
-    response = base_agent.llm.invoke([{"role": "user", "content": routing_prompt}])
-    selected_agent = response.content.strip().lower()
-    
-    if selected_agent not in agents:
-        return f"I'm sorry, I couldn't determine how to handle: '{query}'. Try asking about cities in the database or researching a specific location."
-    
-    return agents[selected_agent].process(query)
+    if "pending_location" in st.session_state:
+        return
+    for job in job_queue.collect_finished(st.session_state.session_id, limit=1):
+        if job["status"] == "done":
+            content = research_agent.stage_result(job["location_name"], job["result"], job_id=job["id"])
+        else:
+            content = f"Error researching {job['location_name']}: {job['error']}"
+            job_queue.mark_delivered(job["id"])  # Nothing to answer
+        st.session_state.messages.append({"role": "assistant", "content": content})
+
+def show_profile(profile: dict, key: str):
+    """Render a turn profile: ranked hotspots and collapsed stacks"""
+    with st.expander(f"Turn profile: {profile['samples']} samples over {profile['duration']:.2f}s"):
+        st.dataframe(profile["hotspots"], use_container_width=True)
+        st.caption("Collapsed stacks (flamegraph.pl / speedscope)")
+        st.code(profile["collapsed"] or "(no samples)", language="text")
+        st.download_button("Download collapsed stacks", profile["collapsed"], file_name="turn.folded", key=key)
 
 if mode == "Chat Interface":
+    # Profiling is opt-in per turn; when off, route_query runs unwrapped
+    if st.session_state.pop("reset_profile_toggle", False):
+        st.session_state.profile_next_turn = False
+    st.sidebar.toggle("Profile next turn", key="profile_next_turn")
+
+    try:
+        collect_research_results()
+        pending_jobs = job_queue.pending_count(st.session_state.session_id,
+                                               exclude_job_id=st.session_state.get("pending_job_id"))
+    except Exception as e:
+        st.sidebar.error(f"Error checking research jobs: {str(e)}")
+        pending_jobs = 0
+
+    if pending_jobs:
+        st.sidebar.info(f"{pending_jobs} research result(s) not shown yet; "
+                        "results appear one at a time after you answer the current one")
+        st.sidebar.button("Check for results")
+
+    # Filled after the chat turn, unless that turn was profiled and shows its profile inline
+    sidebar_profile = st.sidebar.empty()
+    profiled_this_run = False
+
     # Display chat history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -140,9 +132,27 @@ if mode == "Chat Interface":
         # Get agent response
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                response = route_query(prompt)
+                if st.session_state.profile_next_turn:
+                    with SamplingProfiler() as profiler:
+                        response = route_query(prompt)
+                    st.session_state.last_profile = {
+                        "samples": profiler.samples,
+                        "duration": profiler.duration,
+                        "hotspots": profiler.hotspots(),
+                        "collapsed": profiler.collapsed()
+                    }
+                    st.session_state.reset_profile_toggle = True
+                    profiled_this_run = True
+                else:
+                    response = route_query(prompt)
                 st.markdown(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
+            if profiled_this_run:
+                show_profile(st.session_state.last_profile, key="turn_profile")
+
+    if "last_profile" in st.session_state and not profiled_this_run:
+        with sidebar_profile.container():
+            show_profile(st.session_state.last_profile, key="sidebar_profile")
 
 elif mode == "View Existing":
     locations = db_agent.get_existing_locations()
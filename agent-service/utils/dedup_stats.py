@@ -0,0 +1,31 @@
+import threading
+from typing import Dict
+
+class DedupStats:
+    """Counters for duplicate detection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.research_calls_saved = 0
+        self.nearby_flags = 0
+
+    def record_saved(self):
+        with self._lock:
+            self.research_calls_saved += 1
+
+    def record_nearby(self):
+        with self._lock:
+            self.nearby_flags += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "research_calls_saved": self.research_calls_saved,
+                "nearby_flags": self.nearby_flags
+            }
+
+_dedup_stats = DedupStats()
+
+def get_dedup_stats() -> DedupStats:
+    """Return the process-wide duplicate detection counters"""
+    return _dedup_stats
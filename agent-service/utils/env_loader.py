@@ -10,4 +10,14 @@ def get_api_key(key_name: str) -> str:
     api_key = os.getenv(key_name)
     if not api_key:
         raise ValueError(f"{key_name} not found in environment variables")
-    return api_key 
\ No newline at end of file
+    return api_key
+
+def get_db_config() -> dict:
+    """Build the database config from environment variables"""
+    return {
+        "dbname": get_api_key("DB_NAME"),
+        "user": get_api_key("DB_USER"),
+        "password": get_api_key("DB_PASSWORD"),
+        "host": get_api_key("DB_HOST"),
+        "port": get_api_key("DB_PORT")
+    }
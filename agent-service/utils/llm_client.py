@@ -0,0 +1,136 @@
+import functools
+import inspect
+import os
+import threading
+from typing import Dict, Optional
+import anthropic
+import httpx
+from langchain_anthropic import ChatAnthropic
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _check_client_hook():
+    """Fail loudly if ChatAnthropic no longer builds its client in a `_client`
+    cached property, instead of silently falling back to a pool per model.
+    Pinned in requirements.txt; run `python -m loadgen.check_llm_pool` after upgrading."""
+    if not isinstance(inspect.getattr_static(ChatAnthropic, "_client", None), functools.cached_property):
+        raise RuntimeError(
+            "This langchain_anthropic version has no ChatAnthropic._client cached property; "
+            "LLMClientFactory cannot share its connection pool. See requirements.txt."
+        )
+
+class LLMClientFactory:
+    """Builds chat models that share one Anthropic client and keep-alive pool.
+
+    Every model handed out by a factory sends requests over the same
+    `httpx.Client`, so repeat calls from any agent reuse open TCP/TLS
+    connections. Point `base_url` at a local stub server to test without
+    real API traffic.
+    """
+
+    def __init__(self, anthropic_api_key: str, base_url: Optional[str] = None,
+                 timeout: float = 60.0, connect_timeout: float = 10.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0, http2: Optional[bool] = None):
+        self.anthropic_api_key = anthropic_api_key
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2_available() if http2 is None else http2
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._client: Optional[anthropic.Anthropic] = None
+        self._models: Dict[str, ChatAnthropic] = {}
+        self.requests_sent = 0  # Requests that went through the shared pool
+
+    @property
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    http2=self.http2,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._count_request]}
+                )
+            return self._http_client
+
+    def _count_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests_sent += 1
+
+    @property
+    def client(self) -> anthropic.Anthropic:
+        http_client = self.http_client
+        with self._lock:
+            if self._client is None:
+                self._client = anthropic.Anthropic(
+                    api_key=self.anthropic_api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    timeout=self.timeout,
+                    max_retries=0  # Retries happen in the shared rate limiter
+                )
+            return self._client
+
+    def chat_model(self, model: str) -> ChatAnthropic:
+        """Return the shared chat model for `model`"""
+        client = self.client
+        with self._lock:
+            if model not in self._models:
+                _check_client_hook()
+                params = {}
+                if self.base_url:
+                    params["anthropic_api_url"] = self.base_url
+                llm = ChatAnthropic(
+                    anthropic_api_key=self.anthropic_api_key,
+                    model=model,
+                    max_retries=0,
+                    default_request_timeout=self.timeout.read,
+                    **params
+                )
+                # ChatAnthropic builds its client lazily in the `_client` cached
+                # property; fill the cache with our shared client instead
+                llm.__dict__["_client"] = client
+                self._models[model] = llm
+            return self._models[model]
+
+    def close(self):
+        """Close pooled connections"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._client = None
+            self._models = {}
+
+_factories: Dict[str, LLMClientFactory] = {}
+_factories_lock = threading.Lock()
+
+def get_llm_factory(anthropic_api_key: str) -> LLMClientFactory:
+    """Return the process-wide factory for an API key, configured from environment variables.
+
+    Module state survives Streamlit reruns, so the pool is built once per process.
+    """
+    with _factories_lock:
+        if anthropic_api_key not in _factories:
+            http2 = os.getenv("LLM_HTTP2")
+            _factories[anthropic_api_key] = LLMClientFactory(
+                anthropic_api_key=anthropic_api_key,
+                base_url=os.getenv("ANTHROPIC_BASE_URL") or None,
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+                http2=None if http2 is None else http2.lower() in ("1", "true", "yes")
+            )
+        return _factories[anthropic_api_key]
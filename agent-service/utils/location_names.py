@@ -0,0 +1,77 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+US_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga",
+    "hawaii": "hi", "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia",
+    "kansas": "ks", "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms", "missouri": "mo",
+    "montana": "mt", "nebraska": "ne", "nevada": "nv", "new hampshire": "nh", "new jersey": "nj",
+    "new mexico": "nm", "new york": "ny", "north carolina": "nc", "north dakota": "nd", "ohio": "oh",
+    "oklahoma": "ok", "oregon": "or", "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc",
+    "south dakota": "sd", "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt",
+    "virginia": "va", "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy",
+    "district of columbia": "dc"
+}
+STATE_ABBREVIATIONS = set(US_STATES.values())
+COUNTRY_SUFFIXES = [["united", "states"], ["usa"], ["us"]]
+
+def normalize_location_key(name: str) -> str:
+    """Normalize a place name into a key for deduplication.
+
+    Lowercases, drops punctuation and collapses whitespace, so
+    "Bend, Oregon" and " bend  oregon" share a key.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+def _split_state(tokens: List[str]):
+    """Split trailing state tokens off a normalized name: (city tokens, state abbreviation or None)"""
+    for suffix in COUNTRY_SUFFIXES:
+        if len(tokens) > len(suffix) and tokens[-len(suffix):] == suffix:
+            tokens = tokens[:-len(suffix)]
+            break
+    for length in (3, 2, 1):
+        if len(tokens) > length:
+            tail = " ".join(tokens[-length:])
+            if tail in US_STATES:
+                return tokens[:-length], US_STATES[tail]
+    if len(tokens) > 1 and tokens[-1] in STATE_ABBREVIATIONS:
+        return tokens[:-1], tokens[-1]
+    return tokens, None
+
+def canonical_location_key(name: str) -> str:
+    """Canonical key for a place name.
+
+    Builds on normalize_location_key and also abbreviates US state names and
+    drops a trailing country, so "Bend OR", "Bend, Oregon" and "bend oregon "
+    all map to "bend or".
+    """
+    city, state = _split_state(normalize_location_key(name).split())
+    return " ".join(city + ([state] if state else []))
+
+class LocationIndex:
+    """Canonical-name index over catalog location names"""
+
+    def __init__(self, names: List[str]):
+        self.by_key: Dict[str, str] = {}
+        self.by_city: Dict[str, List[str]] = defaultdict(list)
+        for name in names:
+            city, state = _split_state(normalize_location_key(name).split())
+            self.by_key[" ".join(city + ([state] if state else []))] = name
+            self.by_city[" ".join(city)].append(name)
+
+    def find(self, name: str) -> Optional[str]:
+        """Catalog name matching `name`, or None.
+
+        A name without a state matches when exactly one catalog town has that city.
+        """
+        city, state = _split_state(normalize_location_key(name).split())
+        key = " ".join(city + ([state] if state else []))
+        if key in self.by_key:
+            return self.by_key[key]
+        matches = self.by_city.get(" ".join(city), [])
+        if state is None and len(matches) == 1:
+            return matches[0]
+        return None
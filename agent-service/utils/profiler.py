@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+Frame = Tuple[str, str, int]  # (filename, function, first line)
+
+def _label(frame: Frame) -> str:
+    filename, function, lineno = frame
+    return f"{function} ({os.path.basename(filename)}:{lineno})"
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler for the thread that enters it.
+
+    A background thread snapshots the profiled thread's stack every
+    `interval` seconds. Only frames below the `with` block are kept, so the
+    Streamlit runner frames above it do not appear.
+
+        with SamplingProfiler() as profiler:
+            route_query(prompt)
+        profiler.hotspots()
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+        self._entry_frame = None
+        self._started = 0.0
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._entry_frame = sys._getframe(1)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        self._entry_frame = None
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None and frame is not self._entry_frame and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            del frame
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def hotspots(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Functions ranked by self samples (time spent in the function itself)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+
+        samples = self.samples or 1
+        return [
+            {
+                "function": _label(frame),
+                "file": frame[0],
+                "self_samples": own[frame],
+                "self_pct": round(100 * own[frame] / samples, 1),
+                "total_samples": total[frame],
+                "total_pct": round(100 * total[frame] / samples, 1)
+            }
+            for frame in sorted(total, key=lambda f: (own[f], total[f]), reverse=True)[:limit]
+        ]
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format (`a;b;c count`) for flamegraph.pl or speedscope"""
+        return "\n".join(
+            ";".join(_label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        )
@@ -0,0 +1,230 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        # May go negative when actual usage exceeds the estimate; later callers wait off the debt
+        self.tokens -= amount
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for provider rate limit (429) and overload (529) errors"""
+    if _status_code(error) in (429, 529):
+        return True
+    return type(error).__name__ in ("RateLimitError", "OverloadedError")
+
+def is_transient_error(error: Exception) -> bool:
+    """True for errors worth retrying that are not throttling: connection
+    failures, timeouts, 408/409 and 5xx (the same set the Anthropic SDK retries)"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & {"APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException"}:
+        return True
+    status = _status_code(error)
+    return status in (408, 409) or (isinstance(status, int) and status >= 500)
+
+def _retry_after(error: Exception) -> float:
+    """Seconds requested by a Retry-After header, or 0"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for rate limiting (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+class RateLimiter:
+    """Process-wide limiter for LLM calls.
+
+    Combines request and token buckets with AIMD adaptive concurrency: the
+    concurrency limit grows by roughly one per window of successful calls and
+    halves whenever the provider throttles us. Throttled calls, and transient
+    connection/timeout/5xx failures, are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, requests_per_minute: float = 50, tokens_per_minute: float = 40000,
+                 max_concurrency: int = 8, min_concurrency: int = 1, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.throttled_acquires = 0
+        self.throttle_wait_seconds = 0.0
+        self.throttle_errors = 0
+        self.transient_errors = 0
+        self.retries = 0
+        self.failures = 0
+
+    def acquire(self, estimated_tokens: int):
+        """Block until a concurrency slot and bucket capacity are available"""
+        with self._cond:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            start = time.monotonic()
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = None
+                    if self.in_flight < int(self.concurrency_limit):
+                        timeout = max(self.request_bucket.time_until(1, now),
+                                      self.token_bucket.time_until(estimated_tokens, now))
+                        if timeout <= 0:
+                            break
+                    self._cond.wait(timeout)
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(estimated_tokens)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+                waited = time.monotonic() - start
+                self.throttle_wait_seconds += waited
+                if waited > 0.001:
+                    self.throttled_acquires += 1
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None,
+                throttled: bool = False, failed: bool = False):
+        """Return a slot, correct the token estimate and adapt concurrency.
+
+        Only throttling shrinks concurrency; other failures leave it unchanged.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if actual_tokens is not None:
+                self.token_bucket.consume(actual_tokens - estimated_tokens)
+            if throttled:
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            elif not failed:
+                self.concurrency_limit = min(self.max_concurrency,
+                                             self.concurrency_limit + 1 / self.concurrency_limit)
+            self._cond.notify_all()
+
+    def _backoff_seconds(self, attempt: int, error: Exception) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return max(random.uniform(0, ceiling), _retry_after(error))
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int,
+             usage: Callable[[Any], Optional[int]] = lambda result: None) -> Any:
+        """Run `fn` under the limiter, retrying throttled and transient failures"""
+        with self._cond:
+            self.calls += 1
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                transient = not throttled and is_transient_error(e)
+                self.release(estimated_tokens, throttled=throttled, failed=True)
+                if not (throttled or transient):
+                    with self._cond:
+                        self.failures += 1
+                    raise
+                with self._cond:
+                    if throttled:
+                        self.throttle_errors += 1
+                    else:
+                        self.transient_errors += 1
+                    if attempt >= self.max_retries:
+                        self.failures += 1
+                        raise
+                    self.retries += 1
+                time.sleep(self._backoff_seconds(attempt, e))
+                attempt += 1
+                continue
+            self.release(estimated_tokens, actual_tokens=usage(result))
+            return result
+
+    def limits(self) -> Dict[str, Any]:
+        """Configured limits"""
+        return {
+            "requests_per_minute": self.request_bucket.capacity,
+            "tokens_per_minute": self.token_bucket.capacity,
+            "max_concurrency": self.max_concurrency,
+            "max_retries": self.max_retries,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of limiter metrics for sizing workers"""
+        with self._cond:
+            now = time.monotonic()
+            self.request_bucket._refill(now)
+            self.token_bucket._refill(now)
+            return {
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "in_flight": self.in_flight,
+                "concurrency_limit": round(self.concurrency_limit, 2),
+                "calls": self.calls,
+                "throttled_acquires": self.throttled_acquires,
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "avg_throttle_wait_seconds": round(self.throttle_wait_seconds / self.calls, 3) if self.calls else 0.0,
+                "throttle_errors": self.throttle_errors,
+                "transient_errors": self.transient_errors,
+                "retries": self.retries,
+                "failures": self.failures,
+                "requests_available": round(self.request_bucket.tokens, 1),
+                "tokens_available": round(self.token_bucket.tokens, 1),
+            }
+
+def rate_limiter_from_env() -> RateLimiter:
+    """Build a new limiter configured from environment variables"""
+    return RateLimiter(
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "50")),
+        tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "40000")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "4"))
+    )
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter, configured from environment variables"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = rate_limiter_from_env()
+        return _rate_limiter
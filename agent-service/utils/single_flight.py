@@ -0,0 +1,118 @@
+import psycopg2
+import threading
+from typing import Any, Callable, Dict, Optional
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+class AdvisoryLockFlight:
+    """Coalesce calls that share a key across processes.
+
+    Holds a Postgres advisory lock on the key while `fn` runs. A caller that
+    gets the lock straight away just runs `fn`. A caller that had to wait for
+    another holder first asks `lookup` for the result that holder stored, and
+    only runs `fn` if there is none. `fn` must therefore store its result
+    before returning, and `lookup` should only return results at least as
+    fresh as the caller's request.
+    """
+
+    def __init__(self, db_config: dict):
+        self.db_config = db_config
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], lookup: Callable[[str], Any]) -> Any:
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (key,))
+            waited = not cur.fetchone()[0]
+            if waited:
+                cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (key,))
+            try:
+                cached = lookup(key) if waited else None
+                if cached is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                    return cached
+                with self._lock:
+                    self.executed += 1
+                return fn()
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+        finally:
+            cur.close()
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced}
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Return the process-wide SingleFlight registered under `name`"""
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight()
+        return _flights[name]
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """Stats for every process-wide SingleFlight"""
+    with _flights_lock:
+        flights = dict(_flights)
+    return {name: flight.stats() for name, flight in flights.items()}
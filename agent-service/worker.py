@@ -0,0 +1,102 @@
+"""Research worker: claims queued research jobs and runs them.
+
+Run as many of these as needed, on one machine or many:
+
+    python worker.py --poll-interval 2 --visibility-timeout 300
+"""
+import argparse
+import logging
+import os
+import time
+from agents.db_agent import DatabaseAgent
+from agents.research_agent import ResearchAgent
+from jobs.research_queue import JobLease, ResearchJobQueue
+from utils.env_loader import load_env_vars, get_api_key, get_db_config
+from utils.location_names import canonical_location_key
+from utils.single_flight import AdvisoryLockFlight, single_flight_stats
+
+logger = logging.getLogger("research_worker")
+
+def run_job(job: dict, queue: ResearchJobQueue, research_agent: ResearchAgent, flight: AdvisoryLockFlight):
+    """Research one claimed job and record the outcome"""
+    if job["attempts"] > job["max_attempts"]:
+        # Claimed again after its last attempt timed out
+        queue.fail(job["id"], "Visibility timeout exceeded on final attempt", job["attempts"], job["max_attempts"])
+        return
+
+    stored = []
+
+    def research():
+        # Store while still holding the advisory lock so waiting workers find the result
+        data = research_agent.prepare_location_data(job["location_name"])
+        stored.append(queue.complete(job["id"], job["attempts"], data))
+        return data
+
+    try:
+        location_key = job["location_key"] or canonical_location_key(job["location_name"])
+        with JobLease(queue, job):
+            # Only reuse a result finished after this job was queued, never an older one
+            # (e.g. from before a "refresh" deleted the location)
+            data = flight.do(location_key, research,
+                             lookup=lambda key: queue.recent_result(key, job["created_at"]))
+    except Exception as e:
+        retry = queue.fail(job["id"], str(e), job["attempts"], job["max_attempts"])
+        logger.warning("Job %s (%s) failed on attempt %s/%s%s: %s", job["id"], job["location_name"],
+                       job["attempts"], job["max_attempts"], ", will retry" if retry else "", e)
+        return
+
+    if stored:
+        owned = stored[0]
+    else:
+        # Another worker just researched this location; reuse its result
+        owned = queue.complete(job["id"], job["attempts"], data)
+        logger.info("Job %s (%s) coalesced with a result another worker just finished", job["id"], job["location_name"])
+
+    if owned:
+        logger.info("Job %s (%s) done", job["id"], job["location_name"])
+    else:
+        logger.warning("Job %s (%s) finished after its claim expired; result discarded", job["id"], job["location_name"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued location research jobs")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+    parser.add_argument("--visibility-timeout", type=int, default=300, help="Seconds before a claimed job can be reclaimed; extended while the job runs")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per job before it is marked failed")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between rate limiter stats log lines")
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    load_env_vars()
+    anthropic_api_key = get_api_key("ANTHROPIC_API_KEY")
+    db_config = get_db_config()
+
+    queue = ResearchJobQueue(db_config, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    db_agent = DatabaseAgent(anthropic_api_key=anthropic_api_key, db_config=db_config)
+    research_agent = ResearchAgent(anthropic_api_key=anthropic_api_key, db_agent=db_agent)
+    flight = AdvisoryLockFlight(db_config)
+
+    logger.info("Worker started (pid %s)", os.getpid())
+    last_stats = time.monotonic()
+    while True:
+        if time.monotonic() - last_stats >= args.stats_interval:
+            logger.info("Rate limiter: %s", research_agent.rate_limiter.stats())
+            logger.info("Coalesced calls: %s, cross-process: %s", single_flight_stats(), flight.stats())
+            last_stats = time.monotonic()
+
+        try:
+            job = queue.claim()
+        except Exception as e:
+            logger.error("Error claiming job: %s", e)
+            job = None
+
+        if job is None:
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+            continue
+
+        run_job(job, queue, research_agent, flight)
+
+if __name__ == "__main__":
+    main()
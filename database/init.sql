@@ -30,6 +30,50 @@ CREATE TABLE activity_scores (
     UNIQUE(location_id, activity_type)
 );
 
+# Catalog version, bumped on every change to locations or activity scores.
+# The agent-service read API uses it for ETags.
+CREATE TABLE catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO catalog_version DEFAULT VALUES;
+
+CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER locations_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON locations
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+CREATE TRIGGER activity_scores_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON activity_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+CREATE INDEX locations_lat_lon_idx ON locations (latitude, longitude);
+
+# Queue of research jobs processed by agent-service/worker.py
+CREATE TABLE research_jobs (
+    id SERIAL PRIMARY KEY,
+    location_name VARCHAR(255) NOT NULL,
+    location_key VARCHAR(255),
+    session_id VARCHAR(64),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP WITH TIME ZONE,
+    result JSONB,
+    error TEXT,
+    delivered_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX research_jobs_claim_idx ON research_jobs (status, run_after);
+CREATE INDEX research_jobs_location_key_idx ON research_jobs (location_key, status);
+CREATE INDEX research_jobs_session_idx ON research_jobs (session_id, status) WHERE delivered_at IS NULL;
+
 # Grant privileges to the new user
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO outdoor_admin;
 GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO outdoor_admin;